@@ -1 +1,7 @@
 __version__ = "1.2.0"
+
+try:
+    # register the blosc/lz4 HDF5 filters so results written with --frame-compression lz4 can be read
+    import hdf5plugin  # noqa: F401
+except ImportError:
+    pass
@@ -390,6 +390,12 @@ This is only a debugging parameter, for cases where dilate_iterations > 1, other
         type=click.Choice(["uint8", "uint16"]),
         help="Data type for processed frames",
     )(function)
+    function = click.option(
+        "--frame-compression",
+        default="gzip",
+        type=click.Choice(["gzip", "lz4"]),
+        help="Compression filter for extracted frames and scalars (lz4 requires hdf5plugin)",
+    )(function)
     function = click.option(
         "--movie-dtype",
         default="<i2",
@@ -440,6 +446,12 @@ This is only a debugging parameter, for cases where dilate_iterations > 1, other
     function = click.option(
         "--compress-threads", type=int, default=3, help="Number of threads for encoding"
     )(function)
+    function = click.option(
+        "--num-workers",
+        default=1,
+        type=int,
+        help="Number of worker processes used to extract each chunk (-1 uses all cores)",
+    )(function)
     function = click.option(
         "--skip-completed",
         is_flag=True,
@@ -699,9 +711,16 @@ def generate_index(input_dir, output_file):
     type=float,
     help="Threshold value for mean depth to include frames in aggregated results",
 )
-def aggregate_extract_results(input_dir, format, output_dir, mouse_threshold):
+@click.option(
+    "--hardlink",
+    is_flag=True,
+    help="Hard link h5 and mp4 files into the output directory instead of copying (same filesystem only)",
+)
+def aggregate_extract_results(input_dir, format, output_dir, mouse_threshold, hardlink):
 
-    aggregate_extract_results_wrapper(input_dir, format, output_dir, mouse_threshold)
+    aggregate_extract_results_wrapper(
+        input_dir, format, output_dir, mouse_threshold, hardlink=hardlink
+    )
 
 
 @cli.command(
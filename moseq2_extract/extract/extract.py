@@ -3,22 +3,112 @@ Extraction helper utility for computing scalar feature values performing cleanin
 """
 
 import cv2
+import joblib
 import numpy as np
 from copy import deepcopy
 from moseq2_extract.extract.track import em_tracking, em_get_ll
 from moseq2_extract.extract.proc import (
     crop_and_rotate_frames,
     threshold_chunk,
+    subtract_background,
     clean_frames,
     apply_roi,
     get_frame_features,
     get_flips,
+    apply_flips,
     compute_scalars,
     feature_hampel_filter,
     model_smoother,
 )
 
 
+def split_frame_args(arg, indices):
+    """
+    Split a per-frame argument into sub-chunks along the frame axis.
+
+    Args:
+    arg (object): per-frame argument to split; arrays, and tuples and dicts of arrays, are split along
+        their first axis, anything else (e.g. None) is repeated.
+    indices (list): frame indices to split at.
+
+    Returns:
+    (list): list of len(indices) + 1 sub-chunked arguments.
+    """
+
+    if isinstance(arg, np.ndarray) and arg.ndim > 0:
+        return np.split(arg, indices)
+    elif isinstance(arg, tuple):
+        split = [split_frame_args(v, indices) for v in arg]
+        return [tuple(v[i] for v in split) for i in range(len(indices) + 1)]
+    elif isinstance(arg, dict):
+        split = {k: split_frame_args(v, indices) for k, v in arg.items()}
+        return [{k: v[i] for k, v in split.items()} for i in range(len(indices) + 1)]
+    return [arg] * (len(indices) + 1)
+
+
+def concatenate_frame_results(results):
+    """
+    Concatenate the outputs of a per-frame function computed over sub-chunks of frames.
+
+    Args:
+    results (list): list of arrays, dicts of arrays or tuples of either returned from each sub-chunk.
+
+    Returns:
+    (np.ndarray, dict or tuple): results concatenated along the frame axis, structured like each input.
+    """
+
+    if isinstance(results[0], tuple):
+        return tuple(concatenate_frame_results(list(r)) for r in zip(*results))
+    elif isinstance(results[0], dict):
+        return {k: concatenate_frame_results([r[k] for r in results]) for k in results[0]}
+    return np.concatenate(results, axis=0)
+
+
+def map_frame_chunks(func, frames, *args, num_workers=1, split=(), **kwargs):
+    """
+    Apply a function that operates on each frame independently to sub-chunks of frames in worker processes.
+
+    Args:
+    func (function): function func(frames, *args, **kwargs) that processes each frame independently.
+    frames (np.ndarray or tuple): frames to process (nframes x rows x columns), or a tuple of frame arrays.
+    args (list): additional per-frame positional arguments (arrays or dicts of arrays), split with frames.
+    num_workers (int): number of worker processes; 1 runs func in this process, -1 uses all available cores.
+    split (tuple): names of the keyword arguments that are per-frame and split alongside frames.
+    kwargs (dict): additional keyword arguments, passed whole to every worker unless named in split.
+
+    Returns:
+    (np.ndarray, dict or tuple): output of func computed over the entire chunk of frames.
+    """
+
+    nframes = len(frames[0]) if isinstance(frames, tuple) else len(frames)
+    n_jobs = min(joblib.effective_n_jobs(num_workers), nframes)
+
+    if n_jobs <= 1:
+        return func(frames, *args, **kwargs)
+
+    # progress bars from multiple processes would overwrite each other
+    if "progress_bar" in kwargs:
+        kwargs["progress_bar"] = False
+
+    indices = [len(s) for s in np.array_split(np.arange(nframes), n_jobs)]
+    indices = np.cumsum(indices)[:-1]
+
+    split_args = [split_frame_args(a, indices) for a in (frames,) + args]
+    split_kwargs = {
+        k: split_frame_args(v, indices) if k in split else [v] * n_jobs
+        for k, v in kwargs.items()
+    }
+
+    results = joblib.Parallel(n_jobs=n_jobs, backend="loky")(
+        joblib.delayed(func)(
+            *[a[i] for a in split_args], **{k: v[i] for k, v in split_kwargs.items()}
+        )
+        for i in range(n_jobs)
+    )
+
+    return concatenate_frame_results(results)
+
+
 # one stop shopping for taking some frames and doing stuff
 def extract_chunk(
     chunk,
@@ -45,7 +135,7 @@ def extract_chunk(
     flip_classifier=None,
     flip_classifier_smoothing=51,
     frame_dtype="uint8",
-    progress_bar=True,
+    progress_bar=False,
     crop_size=(80, 80),
     true_depth=673.1,
     centroid_hampel_span=5,
@@ -55,6 +145,7 @@ def extract_chunk(
     model_smoothing_clips=(-300, -150),
     tracking_model_init="raw",
     compute_raw_scalars=False,
+    num_workers=1,
     **kwargs
 ):
     """
@@ -96,6 +187,7 @@ def extract_chunk(
     model_smoothing_clips (tuple): Model smoothing clips
     tracking_model_init (str): Method for tracking model initialization
     compute_raw_scalars (bool): Compute scalars from unfiltered crop-rotated data.
+    num_workers (int): Number of worker processes used for the per-frame cleaning, feature and cropping steps.
 
     Returns:
     results (dict): dict object containing the following keys:
@@ -107,30 +199,33 @@ def extract_chunk(
     parameters (dict): mean and covariance estimates for each frame (if em_tracking=True), otherwise None.
     """
 
-    if bground is not None:
-        # Perform background subtraction
-        if not kwargs.get('graduate_walls', False):
-            # pixels with a value of 0 are depth values that could not be computed
-            chunk = ((bground - chunk) * (chunk != 0)).astype(frame_dtype)
-        else:
+    if bground is not None and not kwargs.get('graduate_walls', False):
+        # Perform background subtraction, thresholding and ROI masking together
+        chunk = subtract_background(
+            chunk, bground, min_height, max_height, roi=roi, frame_dtype=frame_dtype
+        )
+    else:
+        if bground is not None:
             # Subtracting only background area where mouse is not on the bucket edge
             mouse_on_edge = (bground < true_depth) & (chunk < bground)
             chunk = (bground - chunk) * np.logical_not(mouse_on_edge) + (
                 true_depth - chunk
             ) * mouse_on_edge
 
-        # Threshold chunk depth values at min and max heights
-        chunk = threshold_chunk(chunk, min_height, max_height).astype(frame_dtype)
+            # Threshold chunk depth values at min and max heights
+            chunk = threshold_chunk(chunk, min_height, max_height).astype(frame_dtype)
 
-    # Apply ROI mask
-    if roi is not None:
-        chunk = apply_roi(chunk, roi)
+        # Apply ROI mask
+        if roi is not None:
+            chunk = apply_roi(chunk, roi)
 
     # Denoise the frames before we do anything else
-    filtered_frames = clean_frames(
+    filtered_frames = map_frame_chunks(
+        clean_frames,
         chunk,
+        num_workers=num_workers,
         prefilter_space=spatial_filter_size,
-        prefilter_time=temporal_filter_size,
+        prefilter_time=None,
         iters_tail=tail_filter_iters,
         strel_tail=strel_tail,
         iters_min=iters_min,
@@ -139,9 +234,18 @@ def extract_chunk(
         progress_bar=progress_bar,
     )
 
+    # The temporal filter spans frames, so it runs over the whole chunk
+    if temporal_filter_size is not None and np.all(np.array(temporal_filter_size) > 0):
+        filtered_frames = clean_frames(
+            filtered_frames,
+            prefilter_space=None,
+            prefilter_time=temporal_filter_size,
+            frame_dtype=frame_dtype,
+        )
+
     # If we need it, compute the EM parameters (for tracking in presence of occluders)
     if use_tracking_model:
-        parameters = em_tracking(
+        parameters, ll = em_tracking(
             filtered_frames,
             chunk,
             rho_mean=rho_mean,
@@ -155,24 +259,34 @@ def extract_chunk(
             depth_ceiling=max_height,
             init_strel=tracking_init_strel,
             init_method=tracking_model_init,
+            return_ll=True,
         )
-        ll = em_get_ll(filtered_frames, progress_bar=progress_bar, **parameters)
     else:
         ll = None
         parameters = None
 
     # now get the centroid and orientation of the mouse
-    features, mask = get_frame_features(
+    features, mask = map_frame_chunks(
+        get_frame_features,
         filtered_frames,
+        num_workers=num_workers,
         frame_threshold=min_height,
+        split=("mask",),
         mask=ll,
         mask_threshold=mask_threshold,
         use_cc=use_cc,
         progress_bar=progress_bar,
     )
 
+    # Unwrap the (pi-periodic) orientation, skipping over frames without a mouse
     incl = ~np.isnan(features["orientation"])
-    features["orientation"][incl] = np.unwrap(features["orientation"][incl] * 2) / 2
+    all_incl = incl.all()
+    orientation = features["orientation"] if all_incl else features["orientation"][incl]
+    np.multiply(orientation, 2, out=orientation)
+    orientation[:] = np.unwrap(orientation)
+    np.multiply(orientation, 0.5, out=orientation)
+    if not all_incl:
+        features["orientation"][incl] = orientation
 
     # Detect and filter out any mouse-centering outlier frames
     features = feature_hampel_filter(
@@ -187,25 +301,31 @@ def extract_chunk(
     if ll is not None:
         features = model_smoother(features, ll=ll, clips=model_smoothing_clips)
 
-    # Crop and rotate the original frames
-    cropped_frames = crop_and_rotate_frames(
-        chunk, features, crop_size=crop_size, progress_bar=progress_bar
-    )
-
-    # Crop and rotate the filtered frames to be returned and later written
-    cropped_filtered_frames = crop_and_rotate_frames(
-        filtered_frames, features, crop_size=crop_size, progress_bar=progress_bar
-    )
-
-    # Compute crop-rotated frame mask
+    # Crop and rotate the original frames, the filtered frames to be returned and later written
+    # and, without a tracking model, the frame mask
     if use_tracking_model:
+        cropped_frames, cropped_filtered_frames = map_frame_chunks(
+            crop_and_rotate_frames,
+            (chunk, filtered_frames),
+            features,
+            num_workers=num_workers,
+            crop_size=crop_size,
+            progress_bar=progress_bar,
+        )
+
+        # Compute crop-rotated frame mask
         use_parameters = deepcopy(parameters)
         use_parameters["mean"][:, 0] = crop_size[1] // 2
         use_parameters["mean"][:, 1] = crop_size[0] // 2
         mask = em_get_ll(cropped_frames, progress_bar=progress_bar, **use_parameters)
     else:
-        mask = crop_and_rotate_frames(
-            mask, features, crop_size=crop_size, progress_bar=progress_bar
+        cropped_frames, cropped_filtered_frames, mask = map_frame_chunks(
+            crop_and_rotate_frames,
+            (chunk, filtered_frames, mask),
+            features,
+            num_workers=num_workers,
+            crop_size=crop_size,
+            progress_bar=progress_bar,
         )
 
     # Orient mouse to face east
@@ -214,16 +334,9 @@ def extract_chunk(
         flips = get_flips(
             cropped_filtered_frames, flip_classifier, flip_classifier_smoothing
         )
-        flip_indices = np.where(flips)
 
         # apply flips
-        cropped_frames[flip_indices] = np.rot90(
-            cropped_frames[flip_indices], k=2, axes=(1, 2)
-        )
-        cropped_filtered_frames[flip_indices] = np.rot90(
-            cropped_filtered_frames[flip_indices], k=2, axes=(1, 2)
-        )
-        mask[flip_indices] = np.rot90(mask[flip_indices], k=2, axes=(1, 2))
+        apply_flips(flips, cropped_frames, cropped_filtered_frames, mask)
         features["orientation"][flips] += np.pi
 
     else:
@@ -2,6 +2,7 @@
 Video pre-processing utilities for detecting ROIs and extracting raw data.
 """
 
+import os
 import cv2
 import joblib
 import tarfile
@@ -12,6 +13,7 @@ import skimage.measure
 import scipy.interpolate
 import skimage.morphology
 from copy import deepcopy
+from functools import lru_cache
 from tqdm.auto import tqdm
 import moseq2_extract.io.video
 import moseq2_extract.extract.roi
@@ -20,6 +22,22 @@ from moseq2_extract.io.image import read_image, write_image
 from moseq2_extract.util import convert_pxs_to_mm, strided_app
 
 
+@lru_cache(maxsize=4)
+def _load_flip_classifier(flip_file, mtime):
+    """
+    Load a flip classifier, cached on its path and modification time so it is read once per extraction.
+
+    Args:
+    flip_file (str): absolute path to pre-trained scipy random forest classifier
+    mtime (int): modification time of the file in nanoseconds
+
+    Returns:
+    clf (sklearn classifier): the loaded classifier
+    """
+
+    return joblib.load(flip_file)
+
+
 def get_flips(frames, flip_file=None, smoothing=None):
     """
     Predict frames where mouse orientation is flipped to later correct.
@@ -34,7 +52,7 @@ def get_flips(frames, flip_file=None, smoothing=None):
     """
 
     try:
-        clf = joblib.load(flip_file)
+        clf = _load_flip_classifier(os.path.abspath(flip_file), os.stat(flip_file).st_mtime_ns)
     except IOError:
         print(f"Could not open file {flip_file}")
         raise
@@ -63,6 +81,26 @@ def get_flips(frames, flip_file=None, smoothing=None):
     return flips
 
 
+def apply_flips(flips, *arrays):
+    """
+    Rotate the flagged frames of each array by 180 degrees in place.
+    Flips are applied over contiguous runs of frames using slices, avoiding the gather/scatter
+    copies of fancy indexing.
+
+    Args:
+    flips (numpy.array): boolean array of frames to flip
+    arrays (numpy.ndarray): frames x rows x columns arrays to flip in place
+
+    Returns:
+    None
+    """
+
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], np.asarray(flips, dtype='int8'), [0]))))
+    for start, stop in edges.reshape(-1, 2):
+        for arr in arrays:
+            arr[start:stop] = arr[start:stop, ::-1, ::-1]
+
+
 def get_largest_cc(frames, progress_bar=False):
     """
     Returns largest connected component blob in image
@@ -172,6 +210,62 @@ def threshold_chunk(chunk, min_height, max_height):
 
     return chunk
 
+
+def subtract_background(chunk, bground, min_height=10, max_height=100, roi=None, frame_dtype='uint8'):
+    """
+    Background subtract, threshold and apply the ROI to a chunk of frames.
+    Heights outside the range of frame_dtype saturate rather than wrap around.
+    Frames are cropped to the ROI bounding box before any arithmetic, the missing-depth and
+    boolean ROI masks are applied together, and uint8 frames are thresholded with a single
+    lookup table pass. Non-boolean ROIs multiply the thresholded frames, like apply_roi.
+
+    Args:
+    chunk (np.ndarray): raw depth frames (nframes, width, height)
+    bground (np.ndarray): background image.
+    min_height (int): Minimum depth values to include after thresholding.
+    max_height (int): Maximum depth values to include after thresholding.
+    roi (np.ndarray): ROI mask to apply, or None to use the whole frame.
+    frame_dtype (str): data type of the returned frames.
+
+    Returns:
+    chunk (3D np.ndarray): background subtracted frames, cropped to the ROI bounding box.
+    """
+
+    if roi is not None:
+        bbox = get_bbox(roi)
+        rows, cols = slice(bbox[0, 0], bbox[1, 0]), slice(bbox[0, 1], bbox[1, 1])
+        chunk, bground, roi = chunk[:, rows, cols], bground[rows, cols], roi[rows, cols]
+
+    # pixels with a value of 0 are depth values that could not be computed
+    valid = chunk != 0
+    if roi is not None and roi.dtype == bool:
+        valid &= roi
+        roi = None
+
+    heights = np.subtract(bground, chunk)
+
+    # saturate heights outside the range of frame_dtype instead of letting the cast wrap them
+    if np.issubdtype(np.dtype(frame_dtype), np.integer):
+        dtype_info = np.iinfo(frame_dtype)
+        np.clip(heights, dtype_info.min, dtype_info.max, out=heights)
+
+    # mask and cast to frame_dtype in a single pass
+    frames = np.empty(heights.shape, frame_dtype)
+    np.multiply(heights, valid, out=frames, casting='unsafe')
+
+    if frames.dtype == np.uint8:
+        lut = np.arange(256, dtype='uint8')
+        lut[(lut < min_height) | (lut > max_height)] = 0
+        frames = cv2.LUT(frames.reshape(-1, frames.shape[-1]), lut).reshape(frames.shape)
+    else:
+        frames = threshold_chunk(frames, min_height, max_height)
+
+    # non-boolean rois multiply the thresholded frames, as in apply_roi
+    if roi is not None:
+        frames = frames * roi
+
+    return frames
+
 def get_roi(depth_image,
             strel_dilate=cv2.getStructuringElement(cv2.MORPH_RECT, (15, 15)),
             dilate_iterations=0,
@@ -301,14 +395,15 @@ def apply_roi(frames, roi):
     roi (np.ndarray): selected ROI to extract from input images.
 
     Returns:
-    cropped_frames (np.ndarray): Frames cropped around ROI Bounding Box.
+    cropped_frames (np.ndarray): Frames cropped around ROI Bounding Box, with the same dtype as frames.
     """
 
     # yeah so fancy indexing slows us down by 3-5x
-    cropped_frames = frames*roi
     bbox = get_bbox(roi)
+    rows, cols = slice(bbox[0, 0], bbox[1, 0]), slice(bbox[0, 1], bbox[1, 1])
 
-    cropped_frames = cropped_frames[:, bbox[0, 0]:bbox[1, 0], bbox[0, 1]:bbox[1, 1]]
+    # crop before masking; a boolean roi keeps the frames' dtype (e.g. uint8)
+    cropped_frames = frames[:, rows, cols] * roi[rows, cols]
     return cropped_frames
 
 
@@ -345,6 +440,93 @@ def im_moment_features(IM):
     return features
 
 
+def get_strel_rectangles(strel, min_size=7):
+    """
+    Decompose a convex structuring element (e.g. an ellipse) into the rectangles whose union forms it.
+    Eroding (dilating) by the union is the minimum (maximum) of eroding (dilating) by each rectangle,
+    and OpenCV filters rectangular elements separably, which is much cheaper than the 2D kernel loop.
+
+    Args:
+    strel (cv2.StructuringElement): structuring element to decompose.
+    min_size (int): smallest element height and width worth decomposing.
+
+    Returns:
+    rectangles (tuple or None): tuple of (kernel, anchor) tuples, or None if strel is already rectangular,
+    smaller than min_size, or not a union of rectangles sharing its anchor.
+    """
+
+    strel = np.asarray(strel) > 0
+    if strel.all() or min(strel.shape) < min_size:
+        return None
+
+    return _decompose_strel(strel.shape, strel.tobytes())
+
+
+@lru_cache(maxsize=32)
+def _decompose_strel(shape, strel_bytes):
+    """
+    Cached decomposition for get_strel_rectangles(), so each element is only decomposed once per process.
+
+    Args:
+    shape (tuple): shape of the structuring element.
+    strel_bytes (bytes): boolean structuring element as bytes.
+
+    Returns:
+    rectangles (tuple or None): (kernel, anchor) tuples, or None if strel is not a union of rectangles.
+    """
+
+    strel = np.frombuffer(strel_bytes, 'bool').reshape(shape)
+
+    anchor_y, anchor_x = strel.shape[0] // 2, strel.shape[1] // 2
+
+    # each distinct row-run spans every row that contains it, which is a rectangle for convex elements
+    rectangles = []
+    recon = np.zeros_like(strel)
+    for c0, c1 in {tuple(np.flatnonzero(row)[[0, -1]]) for row in strel if row.any()}:
+        rows = np.flatnonzero(strel[:, c0:c1 + 1].all(axis=1))
+        r0, r1 = rows[0], rows[-1]
+        rectangles.append((np.ones((r1 - r0 + 1, c1 - c0 + 1), 'uint8'), (anchor_x - c0, anchor_y - r0)))
+        recon[r0:r1 + 1, c0:c1 + 1] = True
+
+    if not np.array_equal(recon, strel):
+        return None
+
+    return tuple(rectangles)
+
+
+def morph_rectangles(frame, rectangles, op=cv2.erode, dst=None):
+    """
+    Erode or dilate a frame by a structuring element decomposed with get_strel_rectangles().
+
+    Args:
+    frame (np.ndarray): frame to filter.
+    rectangles (list): list of (kernel, anchor) tuples.
+    op (function): cv2.erode or cv2.dilate.
+    dst (np.ndarray): optional output array (may be frame itself).
+
+    Returns:
+    filtered (np.ndarray): filtered frame.
+    """
+
+    reduce = cv2.min if op is cv2.erode else cv2.max
+
+    filtered = op(frame, rectangles[0][0], anchor=rectangles[0][1])
+    if len(rectangles) == 1:
+        if dst is None:
+            return filtered
+        np.copyto(dst, filtered)
+        return dst
+
+    scratch = np.empty_like(filtered)
+    for kernel, anchor in rectangles[1:-1]:
+        reduce(filtered, op(frame, kernel, anchor=anchor, dst=scratch), filtered)
+
+    # frame is only overwritten once the last rectangle has been applied
+    kernel, anchor = rectangles[-1]
+    return reduce(filtered, op(frame, kernel, anchor=anchor, dst=scratch),
+                  filtered if dst is None else dst)
+
+
 def clean_frames(frames, prefilter_space=(3,), prefilter_time=None,
                  strel_tail=cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7)),
                  iters_tail=None, frame_dtype='uint8',
@@ -369,19 +551,32 @@ def clean_frames(frames, prefilter_space=(3,), prefilter_time=None,
     """
 
     # seeing enormous speed gains w/ opencv
-    filtered_frames = frames.copy().astype(frame_dtype)
+    filtered_frames = np.array(frames, dtype=frame_dtype)
+
+    # non-rectangular elements are applied as a union of separable rectangles
+    min_rects = get_strel_rectangles(strel_min)
+    tail_rects = get_strel_rectangles(strel_tail)
 
     for i in tqdm(range(frames.shape[0]), disable=not progress_bar, desc='Cleaning frames'):
         # Erode Frames
         if iters_min is not None and iters_min > 0:
-            filtered_frames[i] = cv2.erode(filtered_frames[i], strel_min, iters_min)
+            if min_rects is not None:
+                morph_rectangles(filtered_frames[i], min_rects, cv2.erode, dst=filtered_frames[i])
+            else:
+                filtered_frames[i] = cv2.erode(filtered_frames[i], strel_min, iters_min)
         # Median Blur
         if prefilter_space is not None and np.all(np.array(prefilter_space) > 0):
             for j in range(len(prefilter_space)):
-                filtered_frames[i] = cv2.medianBlur(filtered_frames[i], prefilter_space[j])
+                cv2.medianBlur(filtered_frames[i], prefilter_space[j], dst=filtered_frames[i])
         # Tail Filter
         if iters_tail is not None and iters_tail > 0:
-            filtered_frames[i] = cv2.morphologyEx(filtered_frames[i], cv2.MORPH_OPEN, strel_tail, iters_tail)
+            if tail_rects is not None:
+                eroded = morph_rectangles(filtered_frames[i], tail_rects, cv2.erode)
+                morph_rectangles(eroded, tail_rects, cv2.dilate, dst=filtered_frames[i])
+            else:
+                filtered_frames[i] = cv2.morphologyEx(
+                    filtered_frames[i], cv2.MORPH_OPEN, strel_tail, iters_tail
+                )
 
     # Temporal Median Filter
     if prefilter_time is not None and np.all(np.array(prefilter_time) > 0):
@@ -411,12 +606,16 @@ def get_frame_features(frames, frame_threshold=10, mask=np.array([]),
 
     nframes = frames.shape[0]
 
+    # Threshold the whole chunk at once to compute the frame masks
+    frame_masks = np.greater(frames, frame_threshold)
+
     # Get frame mask
-    if type(mask) is np.ndarray and mask.size > 0:
+    if isinstance(mask, np.ndarray) and mask.size > 0:
         has_mask = True
+        mask_valid = np.greater(mask, mask_threshold)
     else:
         has_mask = False
-        mask = np.zeros((frames.shape), 'uint8')
+        mask = frame_masks.view('uint8')
 
     # Pack contour features into dict
     features = {
@@ -426,22 +625,25 @@ def get_frame_features(frames, frame_threshold=10, mask=np.array([]),
     }
 
     for i in tqdm(range(nframes), disable=not progress_bar, desc='Computing moments'):
-        # Threshold frame to compute mask
-        frame_mask = frames[i] > frame_threshold
+        frame_mask = frame_masks[i]
 
         # Incorporate largest connected component with frame mask
         if use_cc:
-            cc_mask = get_largest_cc((frames[[i]] > mask_threshold).astype('uint8')).squeeze()
-            frame_mask = np.logical_and(cc_mask, frame_mask)
+            cc_frame = frames[i:i + 1] > mask_threshold
+            # a frame entirely above mask_threshold is its own largest component
+            # (e.g. uint8 frames with a negative mask_threshold), so labelling it would be a no-op
+            if not cc_frame.all():
+                cc_mask = get_largest_cc(cc_frame.view('uint8')).squeeze()
+                frame_mask = np.logical_and(cc_mask, frame_mask)
 
         # Apply mask
         if has_mask:
-            frame_mask = np.logical_and(frame_mask, mask[i] > mask_threshold)
-        else:
+            frame_mask = np.logical_and(frame_mask, mask_valid[i])
+        elif use_cc:
             mask[i] = frame_mask
 
         # Get contours in frame
-        cnts, hierarchy = cv2.findContours(frame_mask.astype('uint8'), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        cnts, hierarchy = cv2.findContours(frame_mask.view('uint8'), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
         tmp = np.array([cv2.contourArea(x) for x in cnts])
 
         if tmp.size == 0:
@@ -461,32 +663,37 @@ def crop_and_rotate_frames(frames, features, crop_size=(80, 80), progress_bar=Fa
     Crop mouse from image and orients it such that the head is pointing right
 
     Args:
-    frames (3d np.ndarray): frames to crop and rotate
+    frames (3d np.ndarray or tuple): frames to crop and rotate, or a tuple of frame arrays sharing features.
     features (dict): dict of extracted features, found in result_00.h5 files.
     crop_size (tuple): size of cropped image.
     progress_bar (bool): Display progress bar.
 
     Returns:
-    cropped_frames (3d np.ndarray): Crop and rotated frames.
+    cropped_frames (3d np.ndarray or tuple): Crop and rotated frames, a tuple if frames was a tuple.
     """
 
-    nframes = frames.shape[0]
+    multiple = isinstance(frames, (tuple, list))
+    arrays = tuple(frames) if multiple else (frames,)
+    nframes = arrays[0].shape[0]
+
+    # Prepare cropped frame arrays
+    cropped = tuple(np.zeros((nframes, crop_size[0], crop_size[1]), x.dtype) for x in arrays)
 
-    # Prepare cropped frame array
-    cropped_frames = np.zeros((nframes, crop_size[0], crop_size[1]), frames.dtype)
+    # Same-typed arrays are stacked as channels of one image and rotated with a single warp
+    merge = 1 < len(arrays) <= 4 and len({x.dtype for x in arrays}) == 1 and arrays[0].dtype != np.bool_
+    if merge:
+        rotated = np.empty((crop_size[1], crop_size[0], len(arrays)), arrays[0].dtype)
 
     # Get window dimensions
     win = (crop_size[0] // 2, crop_size[1] // 2 + 1)
     border = (crop_size[1], crop_size[1], crop_size[0], crop_size[0])
+    bounded_shape = (arrays[0].shape[1] + border[0] + border[1], arrays[0].shape[2] + border[2] + border[3])
 
-    for i in tqdm(range(frames.shape[0]), disable=not progress_bar, desc='Rotating'):
+    for i in tqdm(range(nframes), disable=not progress_bar, desc='Rotating'):
 
         if np.any(np.isnan(features['centroid'][i])):
             continue
 
-        # Get bounded frames
-        use_frame = cv2.copyMakeBorder(frames[i], *border, cv2.BORDER_CONSTANT, 0)
-
         # Get row and column centroids
         rr = np.arange(features['centroid'][i, 1]-win[0],
                        features['centroid'][i, 1]+win[1]).astype('int16')
@@ -497,17 +704,37 @@ def crop_and_rotate_frames(frames, features, crop_size=(80, 80), progress_bar=Fa
         cc = cc+crop_size[1]
 
         # Ensure centroids are in bounded frame
-        if (np.any(rr >= use_frame.shape[0]) or np.any(rr < 1)
-                or np.any(cc >= use_frame.shape[1]) or np.any(cc < 1)):
+        if (np.any(rr >= bounded_shape[0]) or np.any(rr < 1)
+                or np.any(cc >= bounded_shape[1]) or np.any(cc < 1)):
             continue
 
         # Rotate the frame such that the mouse is oriented facing east
         rot_mat = cv2.getRotationMatrix2D((crop_size[0] // 2, crop_size[1] // 2),
                                           -np.rad2deg(features['orientation'][i]), 1)
-        cropped_frames[i] = cv2.warpAffine(use_frame[rr[0]:rr[-1], cc[0]:cc[-1]],
-                                           rot_mat, (crop_size[0], crop_size[1]))
 
-    return cropped_frames
+        # Copy the window around the centroid, zero padded where it runs past the frame edge,
+        # instead of padding the whole frame
+        rows = (int(rr[0]) - border[0], int(rr[-1]) - border[0])
+        cols = (int(cc[0]) - border[2], int(cc[-1]) - border[2])
+        src_rows = slice(max(rows[0], 0), min(rows[1], arrays[0].shape[1]))
+        src_cols = slice(max(cols[0], 0), min(cols[1], arrays[0].shape[2]))
+        dst_rows = slice(src_rows.start - rows[0], src_rows.stop - rows[0])
+        dst_cols = slice(src_cols.start - cols[0], src_cols.stop - cols[0])
+
+        if merge:
+            use_frame = np.zeros((rows[1] - rows[0], cols[1] - cols[0], len(arrays)), arrays[0].dtype)
+            for j, x in enumerate(arrays):
+                use_frame[dst_rows, dst_cols, j] = x[i, src_rows, src_cols]
+            cv2.warpAffine(use_frame, rot_mat, (crop_size[0], crop_size[1]), dst=rotated)
+            for j, cropped_frames in enumerate(cropped):
+                cropped_frames[i] = rotated[..., j]
+        else:
+            for x, cropped_frames in zip(arrays, cropped):
+                use_frame = np.zeros((rows[1] - rows[0], cols[1] - cols[0]), x.dtype)
+                use_frame[dst_rows, dst_cols] = x[i, src_rows, src_cols]
+                cv2.warpAffine(use_frame, rot_mat, (crop_size[0], crop_size[1]), dst=cropped_frames[i])
+
+    return cropped if multiple else cropped[0]
 
 
 def compute_scalars(frames, track_features, min_height=10, max_height=100, true_depth=673.1):
@@ -566,7 +793,8 @@ def compute_scalars(frames, track_features, min_height=10, max_height=100, true_
 
     features['width_px'] = np.min(track_features['axis_length'], axis=1)
     features['length_px'] = np.max(track_features['axis_length'], axis=1)
-    features['area_px'] = np.sum(masked_frames, axis=(1, 2))
+    nmask = np.count_nonzero(masked_frames, axis=(1, 2))
+    features['area_px'] = nmask
 
     features['width_mm'] = features['width_px'] * px_to_mm[:, 1]
     features['length_mm'] = features['length_px'] * px_to_mm[:, 0]
@@ -574,12 +802,9 @@ def compute_scalars(frames, track_features, min_height=10, max_height=100, true_
 
     features['angle'] = track_features['orientation']
 
-    nmask = np.sum(masked_frames, axis=(1, 2))
-
-    for i in range(nframes):
-        if nmask[i] > 0:
-            features['height_ave_mm'][i] = np.mean(
-                frames[i, masked_frames[i]])
+    # average height of the masked pixels in each frame, 0 where no pixels are in range
+    height_sum = np.sum(frames, axis=(1, 2), dtype='float64', where=masked_frames)
+    np.divide(height_sum, nmask, out=features['height_ave_mm'], where=nmask > 0, casting='unsafe')
 
     vel_x = np.diff(np.concatenate((features['centroid_x_px'][:1], features['centroid_x_px'])))
     vel_y = np.diff(np.concatenate((features['centroid_y_px'][:1], features['centroid_y_px'])))
@@ -75,7 +75,7 @@ def em_init(
 
     mask = np.logical_and(depth_frame > depth_floor, depth_frame < depth_ceiling)
     mask = cv2.morphologyEx(
-        mask.astype("uint8"), cv2.MORPH_OPEN, init_strel, strel_iters
+        mask.view("uint8"), cv2.MORPH_OPEN, init_strel, strel_iters
     )
 
     cnts, hierarchy = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
@@ -101,12 +101,13 @@ def em_tracking(
     rho_cov=0,
     depth_floor=10,
     depth_ceiling=100,
-    progress_bar=True,
+    progress_bar=False,
     init_mean=None,
     init_cov=None,
     init_frames=10,
     init_method="raw",
     init_strel=cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (9, 9)),
+    return_ll=False,
 ):
     """
     Naive tracker, use EM update rules to follow a 3D Gaussian around the room.
@@ -126,9 +127,11 @@ def em_tracking(
     init_frames (int): number of frames to include in the init calulation
     init_method (str): mode in which to process inputs
     init_strel (cv2.structuringElement): structuring Element to compute mask.
+    return_ll (bool): also return the log likelihoods of frames under the final estimates, as em_get_ll().
 
     Returns:
     model_parameters (dict): mean and covariance estimates for each frame
+    ll (numpy.ndarray): frames x rows x columns, log likelihood of each pixel (only if return_ll is True)
     """
 
     # initialize the mean and covariance
@@ -180,6 +183,9 @@ def em_tracking(
     for k, v in model_parameters.items():
         model_parameters[k][:] = np.nan
 
+    if return_ll:
+        ll = np.zeros(frames.shape, dtype="float64")
+
     frames = frames.reshape(frames.shape[0], frames.shape[1] * frames.shape[2])
     pbar = tqdm(total=nframes, disable=not progress_bar, desc="Computing EM")
     i = 0
@@ -203,7 +209,7 @@ def em_tracking(
         if segment and not repeat:
             try:
                 cnts, hierarchy = cv2.findContours(
-                    (pxtheta_im > ll_threshold).astype("uint8"),
+                    (pxtheta_im > ll_threshold).view("uint8"),
                     cv2.RETR_TREE,
                     cv2.CHAIN_APPROX_SIMPLE,
                 )
@@ -277,6 +283,14 @@ def em_tracking(
         model_parameters["mean"][i] = mean
         model_parameters["cov"][i] = cov
 
+        # compute the likelihood while the frame is at hand, rather than in a second pass
+        if return_ll:
+            if repeat:
+                xyz = np.vstack((coords, frames[i].ravel()))
+            ll[i] = scipy.stats.multivariate_normal.logpdf(xyz.T, mean, cov).reshape(
+                (r, c)
+            )
+
         # TODO: add the walk-back where we use the
         # raw frames in case our update craps out...
 
@@ -286,6 +300,9 @@ def em_tracking(
 
     pbar.close()
 
+    if return_ll:
+        return model_parameters, ll
+
     return model_parameters
 
 
@@ -3,8 +3,8 @@ GUI front-end operations accessible from a jupyter notebook.
 """
 
 import os
+import re
 import ruamel.yaml as yaml
-from ast import literal_eval
 from os.path import dirname, basename, exists, join
 from moseq2_extract.util import read_yaml
 from moseq2_extract.io.image import read_tiff_files
@@ -21,7 +21,14 @@ from moseq2_extract.util import (
     load_found_session_paths,
     filter_warnings,
 )
-from moseq2_extract.cli import batch_extract
+from moseq2_extract.cli import extract, batch_extract
+
+# a session index or hyphenated range of indices, optionally prefixed with "e" to exclude it
+SESSION_SELECTION_RE = re.compile(r"^(e)?\s*(\d+)(?:\s*-\s*(\d+))?$")
+
+# default values of the optional extraction parameters
+_EXTRACT_DEFAULTS = {tmp.name: tmp.default for tmp in extract.params if not tmp.required}
+_BATCH_EXTRACT_DEFAULTS = {tmp.name: tmp.default for tmp in batch_extract.params if not tmp.required}
 
 
 def get_selected_sessions(to_extract, extract_all):
@@ -36,7 +43,7 @@ def get_selected_sessions(to_extract, extract_all):
     to_extract (list): new list of selected sessions to extract.
     """
 
-    selected_sess_idx, excluded_sess_idx, ret_extract = [], [], []
+    selected_sess_idx, excluded_sess_idx, ret_extract = [], set(), []
 
     def parse_input(s):
         """
@@ -45,29 +52,21 @@ def get_selected_sessions(to_extract, extract_all):
 
         Args:
         s (str): User input session indices.
+
+        Returns:
+        (bool): whether s is a valid session selection.
         """
-        if "e" not in s and "-" not in s:
-            if isinstance(literal_eval(s), int):
-                selected_sess_idx.append(int(s))
-        elif "e" not in s and "-" in s:
-            ss = s.split("-")
-            if isinstance(literal_eval(ss[0]), int) and isinstance(
-                literal_eval(ss[1]), int
-            ):
-                for i in range(int(ss[0]), int(ss[1]) + 1):
-                    selected_sess_idx.append(i)
-        elif "e" in s:
-            ss = s.strip("e ")
-            if "-" not in ss:
-                if isinstance(literal_eval(ss), int):
-                    excluded_sess_idx.append(int(ss))
-            else:
-                ssd = ss.split("-")
-                if isinstance(literal_eval(ssd[0]), int) and isinstance(
-                    literal_eval(ssd[1]), int
-                ):
-                    for i in range(int(ssd[0]), int(ssd[1]) + 1):
-                        excluded_sess_idx.append(i)
+        match = SESSION_SELECTION_RE.match(s.strip())
+        if match is None:
+            return False
+
+        exclude, start, stop = match.groups()
+        indices = range(int(start), int(stop if stop is not None else start) + 1)
+        if exclude:
+            excluded_sess_idx.update(indices)
+        else:
+            selected_sess_idx.extend(indices)
+        return True
 
     if len(to_extract) > 1 and not extract_all:
         for i, sess in enumerate(to_extract):
@@ -85,16 +84,19 @@ def get_selected_sessions(to_extract, extract_all):
             sessions = input("Input your selected sessions to extract: ")
             if "q" in sessions.lower():
                 return []
+            if len(sessions) > 0 and not all(
+                [parse_input(s) for s in sessions.split(",")]
+            ):
+                # never fall back to selecting every session on a malformed selection
+                selected_sess_idx.clear()
+                excluded_sess_idx.clear()
+                print("Invalid input. Try again or press q to quit.")
+                continue
             if "," in sessions:
-                selection = sessions.split(",")
-                for s in selection:
-                    s = s.strip()
-                    parse_input(s)
                 for i in selected_sess_idx:
                     if i not in excluded_sess_idx:
                         ret_extract.append(to_extract[i - 1])
             elif len(sessions) > 0:
-                parse_input(sessions)
                 if len(selected_sess_idx) > 0:
                     iters = selected_sess_idx
                 else:
@@ -123,11 +125,7 @@ def generate_config_command(output_file, camera_type="k2"):
     (str): status message.
     """
 
-    from .cli import extract
-
-    objs = extract.params
-
-    params = {tmp.name: tmp.default for tmp in objs if not tmp.required}
+    params = dict(_EXTRACT_DEFAULTS)
     if camera_type == "azure":
         params["bg_roi_depth_range"] = [550, 650]
         params["spatial_filter_size"] = [5]
@@ -191,12 +189,8 @@ def extract_found_sessions(
         run_local_extract(to_extract, config_file, skip_extracted)
         print("Extractions Complete.")
     else:
-        # Get default CLI params
-        params = {
-            tmp.name: tmp.default for tmp in batch_extract.params if not tmp.required
-        }
-        # merge default params and config data, preferring values in config data
-        config_data = {**params, **config_data}
+        # merge default CLI params and config data, preferring values in config data
+        config_data = {**_BATCH_EXTRACT_DEFAULTS, **config_data}
 
         # function call to run_slurm_extract to be implemented
         run_slurm_extract(input_dir, to_extract, config_data, skip_extracted)
@@ -4,13 +4,19 @@ Contains helper functions for handling/storing data during extraction.
 
 import os
 import h5py
+import errno
+import joblib
 import shutil
 import tarfile
 import warnings
+import zlib
 import numpy as np
 import ruamel.yaml as yaml
 from tqdm.auto import tqdm
 from cytoolz import keymap
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor
+from joblib.externals.loky import get_reusable_executor
 from pkg_resources import get_distribution
 from moseq2_extract.io.video import load_timestamps_from_movie
 from os.path import exists, join, dirname, basename, splitext
@@ -85,47 +91,96 @@ def build_index_dict(files_to_use):
     return output_dict
 
 
-def load_extraction_meta_from_h5s(to_load, snake_case=True):
+def _load_extraction_meta(_dict, _h5f, snake_case=True):
+    """
+    Load the extraction metadata of a single h5 file into its results dict.
+
+    Args:
+    _dict (dict): loaded results yaml of the extraction.
+    _h5f (str): path to the extraction h5 file.
+    snake_case (bool): whether to save the files using snake_case
+
+    Returns:
+    (tuple): the updated results dict and the h5 path.
+    """
+
+    with h5py.File(_h5f, "r") as f:
+        if "metadata/acquisition" in f:
+            # v0.1.3 introduced a change - acq. metadata now here
+            tmp = h5_to_dict(f, "/metadata/acquisition")
+        elif "metadata/extraction" in f:
+            # if it doesn't exist it's likely from an older moseq version. Try loading it here
+            tmp = h5_to_dict(f, "/metadata/extraction")
+        else:
+            # if all else fails, abandon all hope
+            tmp = {}
+
+    # note that everything going into here must be a string (no bytes!)
+    tmp = {k: str(v) for k, v in tmp.items()}
+    if snake_case:
+        tmp = keymap(camel_to_snake, tmp)
+
+    # Specific use case block: Behavior reinforcement experiments
+    feedback_file = join(dirname(_h5f), "..", "feedback_ts.txt")
+    if exists(feedback_file):
+        timestamps = map(int, load_timestamps(feedback_file, 0))
+        feedback_status = map(int, load_timestamps(feedback_file, 1))
+        _dict["feedback_timestamps"] = list(zip(timestamps, feedback_status))
+
+    _dict["extraction_metadata"] = tmp
+
+    return _dict, _h5f
+
+
+def load_extraction_meta_from_h5s(to_load, snake_case=True, num_workers=-1, min_parallel=10):
     """
     Load extraction metadata from h5 files.
 
     Args:
     to_load (list): list of paths to h5 files.
     snake_case (bool): whether to save the files using snake_case
+    num_workers (int): number of worker processes used to read the h5 files; -1 uses all available cores.
+    min_parallel (int): minimum number of h5 files to start worker processes for; fewer are read serially.
 
     Returns:
     loaded (list): list of loaded h5 dicts.
     """
 
-    loaded = []
-    for _dict, _h5f in tqdm(to_load, desc="Scanning data"):
-        try:
-            # v0.1.3 introduced a change - acq. metadata now here
-            tmp = h5_to_dict(_h5f, "/metadata/acquisition")
-        except KeyError:
-            # if it doesn't exist it's likely from an older moseq version. Try loading it here
-            try:
-                tmp = h5_to_dict(_h5f, "/metadata/extraction")
-            except KeyError:
-                # if all else fails, abandon all hope
-                tmp = {}
+    n_jobs = min(joblib.effective_n_jobs(num_workers), len(to_load))
+
+    if n_jobs <= 1 or len(to_load) < min_parallel:
+        return [
+            _load_extraction_meta(_dict, _h5f, snake_case=snake_case)
+            for _dict, _h5f in tqdm(to_load, desc="Scanning data")
+        ]
+
+    # HDF5 serializes reads within a process, so the sessions are read in worker processes
+    executor = get_reusable_executor(max_workers=n_jobs)
+    dicts, h5s = zip(*to_load)
+    results = executor.map(
+        partial(_load_extraction_meta, snake_case=snake_case), dicts, h5s
+    )
+
+    return list(tqdm(results, total=len(to_load), desc="Scanning data"))
 
-        # note that everything going into here must be a string (no bytes!)
-        tmp = {k: str(v) for k, v in tmp.items()}
-        if snake_case:
-            tmp = keymap(camel_to_snake, tmp)
 
-        # Specific use case block: Behavior reinforcement experiments
-        feedback_file = join(dirname(_h5f), "..", "feedback_ts.txt")
-        if exists(feedback_file):
-            timestamps = map(int, load_timestamps(feedback_file, 0))
-            feedback_status = map(int, load_timestamps(feedback_file, 1))
-            _dict["feedback_timestamps"] = list(zip(timestamps, feedback_status))
+def _scan_dir(path):
+    """
+    List the entries of a directory with a single os.scandir call, so several candidate
+    files can be checked without an os.path.exists call each.
+
+    Args:
+    path (str): path to the directory to scan.
 
-        _dict["extraction_metadata"] = tmp
-        loaded += [(_dict, _h5f)]
+    Returns:
+    entries (dict): os.DirEntry objects keyed by name (empty if the directory does not exist).
+    """
 
-    return loaded
+    try:
+        with os.scandir(path) as it:
+            return {entry.name: entry for entry in it}
+    except (FileNotFoundError, NotADirectoryError):
+        return {}
 
 
 def build_manifest(loaded, format, snake_case=True):
@@ -153,7 +208,7 @@ def build_manifest(loaded, format, snake_case=True):
         {
             "filename": "feedback_ts.txt",
             "var_name": "realtime_feedback",
-            "dtype": np.bool,
+            "dtype": np.bool_,
         }
     )
 
@@ -162,7 +217,7 @@ def build_manifest(loaded, format, snake_case=True):
         {
             "filename": "predictions.txt",
             "var_name": "realtime_predictions",
-            "dtype": np.int,
+            "dtype": np.int64,
         }
     )
 
@@ -196,11 +251,13 @@ def build_manifest(loaded, format, snake_case=True):
             "yaml_dict": _dict,
             "additional_metadata": {},
         }
+        parent = join(dirname(_h5f), "..")
+        entries = _scan_dir(parent)
         for meta in additional_meta:
-            filename = join(dirname(_h5f), "..", meta["filename"])
-            if exists(filename):
+            entry = entries.get(meta["filename"])
+            if entry is not None and entry.is_file():
                 try:
-                    data, timestamps = load_textdata(filename, dtype=meta["dtype"])
+                    data, timestamps = load_textdata(entry.path, dtype=meta["dtype"])
                     manifest[_h5f]["additional_metadata"][meta["var_name"]] = {
                         "data": data,
                         "timestamps": timestamps,
@@ -213,49 +270,141 @@ def build_manifest(loaded, format, snake_case=True):
     return manifest
 
 
-def copy_manifest_results(manifest, output_dir):
+def fast_copy(src, dst):
     """
-    Copy all consolidated manifest results to their respective output files.
+    Copy a file with os.copy_file_range or os.sendfile where available, letting the kernel
+    move (or reflink) the data without passing it through Python. Falls back to
+    shutil.copyfile when neither call is supported for this platform or pair of filesystems.
 
     Args:
-    manifest (dict): manifest dictionary containing all extraction h5 metadata to save
-    output_dir (str): path to directory where extraction results will be aggregated.
+    src (str): path to the file to copy.
+    dst (str): path to copy the file to.
+    """
+
+    unsupported = (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EPERM)
 
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30) > 0:
+                    pass
+            return
+        except OSError as e:
+            if e.errno not in unsupported:
+                raise
+
+    # os.copy_file_range only exists on python >= 3.8; sendfile covers file -> file on linux
+    if hasattr(os, "sendfile"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                offset = 0
+                while True:
+                    sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, 1 << 30)
+                    if sent == 0:
+                        break
+                    offset += sent
+            return
+        except OSError as e:
+            if e.errno not in unsupported:
+                raise
+
+    shutil.copyfile(src, dst)
+
+
+def link_or_copy(src, dst):
     """
+    Hard link dst to src, copying the file instead when linking fails
+    (e.g. src and dst are on different filesystems).
 
-    if not exists(output_dir):
-        os.makedirs(output_dir)
+    Args:
+    src (str): path to the file to link or copy.
+    dst (str): path of the new file.
+    """
 
-    # now the key is the source h5 file and the value is the path to copy to
-    for k, v in tqdm(manifest.items(), desc="Copying files"):
+    try:
+        os.link(src, dst)
+    except OSError:
+        fast_copy(src, dst)
 
-        if exists(join(output_dir, f'{v["copy_path"]}.h5')):
-            continue
 
-        in_basename = splitext(basename(k))[0]
-        in_dirname = dirname(k)
+def _copy_manifest_entry(k, v, output_dir, hardlink=False):
+    """
+    Copy a single extraction's h5, mp4 and yaml files listed in the manifest to output_dir.
+
+    Args:
+    k (str): path to the source h5 file.
+    v (dict): manifest entry for the source h5 file.
+    output_dir (str): path to directory where extraction results will be aggregated.
+    hardlink (bool): hard link the h5 and mp4 files instead of copying them where possible.
+    """
+
+    if exists(join(output_dir, f'{v["copy_path"]}.h5')):
+        return
 
-        h5_path = k
-        mp4_path = join(in_dirname, f"{in_basename}.mp4")
+    in_basename = splitext(basename(k))[0]
+    in_dirname = dirname(k)
 
-        if exists(h5_path):
-            new_h5_path = join(output_dir, f'{v["copy_path"]}.h5')
-            shutil.copyfile(h5_path, new_h5_path)
+    h5_path = k
+    mp4_path = join(in_dirname, f"{in_basename}.mp4")
+
+    if exists(h5_path):
+        new_h5_path = join(output_dir, f'{v["copy_path"]}.h5')
+        # h5 files that get additional metadata written to them must not share the source's inode
+        if hardlink and len(v["additional_metadata"]) == 0:
+            link_or_copy(h5_path, new_h5_path)
+        else:
+            fast_copy(h5_path, new_h5_path)
 
-        # if we have additional_meta then crack open the h5py and write to a safe place
-        if len(v["additional_metadata"]) > 0:
+    # if we have additional_meta then crack open the h5py and write to a safe place
+    if len(v["additional_metadata"]) > 0:
+        with h5py.File(new_h5_path, "a") as f:
+            misc = f.require_group("metadata/misc")
             for k2, v2 in v["additional_metadata"].items():
-                new_key = f"/metadata/misc/{k2}"
-                with h5py.File(new_h5_path, "a") as f:
-                    f.create_dataset(f"{new_key}/data", data=v2["data"])
-                    f.create_dataset(f"{new_key}/timestamps", data=v2["timestamps"])
+                group = misc.create_group(k2)
+                group.create_dataset("data", data=v2["data"])
+                group.create_dataset("timestamps", data=v2["timestamps"])
+
+    if exists(mp4_path):
+        copy = link_or_copy if hardlink else fast_copy
+        copy(mp4_path, join(output_dir, f'{v["copy_path"]}.mp4'))
+
+    v["yaml_dict"].pop("extraction_metadata", None)
+    with open(f'{join(output_dir, v["copy_path"])}.yaml', "w") as f:
+        yaml.safe_dump(v["yaml_dict"], f)
+
+
+def copy_manifest_results(manifest, output_dir, max_workers=16, hardlink=False):
+    """
+    Copy all consolidated manifest results to their respective output files.
+
+    Args:
+    manifest (dict): manifest dictionary containing all extraction h5 metadata to save
+    output_dir (str): path to directory where extraction results will be aggregated.
+    max_workers (int): maximum number of sessions copied concurrently.
+    hardlink (bool): hard link unmodified h5 and mp4 files instead of copying them where possible.
+
+    """
+
+    if not exists(output_dir):
+        os.makedirs(output_dir)
+
+    if len(manifest) == 0:
+        return
 
-        if exists(mp4_path):
-            shutil.copyfile(mp4_path, join(output_dir, f'{v["copy_path"]}.mp4'))
+    # now the key is the source h5 file and the value is the path to copy to;
+    # keep only the first entry per copy_path (later duplicates used to be skipped
+    # as already copied) so concurrent copies never share a destination
+    entries = {}
+    for k, v in manifest.items():
+        entries.setdefault(v["copy_path"], (k, v))
 
-        v["yaml_dict"].pop("extraction_metadata", None)
-        with open(f'{join(output_dir, v["copy_path"])}.yaml', "w") as f:
-            yaml.safe_dump(v["yaml_dict"], f)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(entries))) as pool:
+        futures = [
+            pool.submit(_copy_manifest_entry, k, v, output_dir, hardlink=hardlink)
+            for k, v in entries.values()
+        ]
+        for future in tqdm(futures, desc="Copying files"):
+            future.result()
 
 
 def handle_extract_metadata(input_file, dirname):
@@ -287,31 +436,31 @@ def handle_extract_metadata(input_file, dirname):
 
         tar = tarfile.open(input_file, "r:gz")
         tar_members = tar.getmembers()
-        tar_names = [_.name for _ in tar_members]
+        # keep the first member per name, matching the old list.index lookups
+        members = {}
+        for m in tar_members:
+            members.setdefault(m.name, m)
 
     if tar is not None:
         # Handling tar paths
-        metadata_path = tar.extractfile(tar_members[tar_names.index("metadata.json")])
-        if "depth_ts.txt" in tar_names:
-            timestamp_path = tar.extractfile(
-                tar_members[tar_names.index("depth_ts.txt")]
-            )
-        elif "timestamps.csv" in tar_names:
-            timestamp_path = tar.extractfile(
-                tar_members[tar_names.index("timestamps.csv")]
-            )
+        metadata_path = tar.extractfile(members["metadata.json"])
+        if "depth_ts.txt" in members:
+            timestamp_path = tar.extractfile(members["depth_ts.txt"])
+        elif "timestamps.csv" in members:
+            timestamp_path = tar.extractfile(members["timestamps.csv"])
             alternate_correct = True
     else:
         # Handling non-compressed session paths
         metadata_path = join(dirname, "metadata.json")
         timestamp_path = join(dirname, "depth_ts.txt")
         alternate_timestamp_path = join(dirname, "timestamps.csv")
+        entries = _scan_dir(dirname or os.curdir)
         # Checks for alternative timestamp file if original .txt extension does not exist
-        if not exists(timestamp_path) and exists(alternate_timestamp_path):
+        if "depth_ts.txt" not in entries and "timestamps.csv" in entries:
             timestamp_path = alternate_timestamp_path
             alternate_correct = True
         elif not (
-            exists(timestamp_path) or exists(alternate_timestamp_path)
+            "depth_ts.txt" in entries or "timestamps.csv" in entries
         ) and input_file.endswith(".mkv"):
             from_depth_file = True
 
@@ -324,7 +473,157 @@ def handle_extract_metadata(input_file, dirname):
     return acquisition_metadata, timestamps, tar
 
 
+@lru_cache(maxsize=None)
+def get_extract_version():
+    """
+    Get the installed moseq2-extract version, looked up once per process since
+    pkg_resources scans the installed distributions on every call.
+
+    Returns:
+    version (str): moseq2-extract version string.
+    """
+
+    return get_distribution("moseq2-extract").version
+
+
 # extract h5 helper function
+def create_h5_file(filename, metadata_cache_size=128 * 1024 ** 2, chunk_cache_size=16 * 1024 ** 2):
+    """
+    Create (or truncate) an h5 file with a fixed-size metadata cache, so the many datasets and attributes
+    written during an extraction do not repeatedly resize and evict the cache.
+
+    Args:
+    filename (str): path to the h5 file to create.
+    metadata_cache_size (int): size of the metadata cache in bytes.
+    chunk_cache_size (int): size of each dataset's raw data chunk cache in bytes.
+
+    Returns:
+    h5_file (h5py.File): opened, writable h5 file object.
+    """
+
+    fapl = h5py.h5p.create(h5py.h5p.FILE_ACCESS)
+
+    cache_config = fapl.get_mdc_config()
+    cache_config.set_initial_size = True
+    cache_config.initial_size = metadata_cache_size
+    cache_config.min_size = metadata_cache_size
+    cache_config.max_size = metadata_cache_size
+    # disable automatic cache resizing (H5C_incr_off, H5C_flash_incr_off, H5C_decr_off)
+    cache_config.incr_mode = 0
+    cache_config.flash_incr_mode = 0
+    cache_config.decr_mode = 0
+    fapl.set_mdc_config(cache_config)
+
+    # leave room for the partially written chunks at batch boundaries
+    mdc_nelmts, rdcc_nslots, rdcc_nbytes, rdcc_w0 = fapl.get_cache()
+    fapl.set_cache(mdc_nelmts, max(rdcc_nslots, 10007), chunk_cache_size, rdcc_w0)
+
+    fid = h5py.h5f.create(os.fsencode(filename), h5py.h5f.ACC_TRUNC, fapl=fapl)
+
+    return h5py.File(fid)
+
+
+def get_frame_chunks(nframes, frame_shape, dtype, chunk_bytes=1024 ** 2):
+    """
+    Get an h5 chunk shape spanning whole frames, holding roughly chunk_bytes of frame data,
+    so extracted batches are written as a few large chunks.
+
+    Args:
+    nframes (int): number of frames in the dataset.
+    frame_shape (tuple): shape of each frame.
+    dtype (str or np.dtype): dataset data type.
+    chunk_bytes (int): target chunk size in bytes.
+
+    Returns:
+    chunks (tuple): chunk shape for the dataset.
+    """
+
+    frame_bytes = int(np.prod(frame_shape)) * np.dtype(dtype).itemsize
+    chunk_frames = min(max(1, chunk_bytes // frame_bytes), max(1, nframes))
+
+    return (chunk_frames,) + tuple(frame_shape)
+
+
+def write_frame_chunks(dataset, data, start):
+    """
+    Write frames to a chunked, gzip-compressed dataset starting at frame index start. Whole chunks
+    covered by the data are deflated in parallel threads and written with write_direct_chunk,
+    skipping HDF5's single-threaded filter pipeline; the partial chunks at either end (and
+    datasets with other filters) go through a regular slice write.
+
+    Args:
+    dataset (h5py.Dataset): dataset chunked along its first axis.
+    data (np.ndarray): frames to write.
+    start (int): index of the first frame to write in the dataset.
+    """
+
+    stop = start + len(data)
+    direct = (
+        dataset.compression == "gzip"
+        and not dataset.shuffle
+        and not dataset.fletcher32
+        and dataset.scaleoffset is None
+        and dataset.chunks is not None
+        and dataset.chunks[1:] == dataset.shape[1:]
+        and data.dtype == dataset.dtype
+    )
+    if direct:
+        chunk_frames = dataset.chunks[0]
+        first = -(-start // chunk_frames) * chunk_frames
+        last = stop // chunk_frames * chunk_frames
+    if not direct or first >= last:
+        dataset[start:stop] = data
+        return
+
+    if start < first:
+        dataset[start:first] = data[: first - start]
+    if last < stop:
+        dataset[last:stop] = data[last - start :]
+
+    level = dataset.compression_opts
+
+    def compress(offset):
+        block = data[offset - start : offset - start + chunk_frames]
+        return zlib.compress(np.ascontiguousarray(block), level)
+
+    offsets = range(first, last, chunk_frames)
+    with ThreadPoolExecutor(max_workers=min(len(offsets), os.cpu_count() or 1)) as pool:
+        for offset, compressed in zip(offsets, pool.map(compress, offsets)):
+            dataset.id.write_direct_chunk((offset,) + (0,) * (data.ndim - 1), compressed)
+
+
+def get_compression(compression="gzip"):
+    """
+    Get the h5py dataset filter arguments for the extracted frames and scalars.
+
+    "lz4" selects the blosc/lz4 filter with bitshuffle from hdf5plugin, which compresses
+    much faster than gzip. Files written with it need hdf5plugin imported to be read back.
+
+    Args:
+    compression (str): either "gzip" or "lz4".
+
+    Returns:
+    kwargs (dict): compression keyword arguments for h5py.Group.create_dataset.
+    """
+
+    if compression == "gzip":
+        return {"compression": "gzip"}
+    elif compression == "lz4":
+        try:
+            import hdf5plugin
+        except ImportError:
+            raise ImportError(
+                'lz4 compression requires hdf5plugin; install it with pip install "moseq2-extract[blosc]"'
+            )
+        return dict(
+            hdf5plugin.Blosc(
+                cname="lz4", clevel=3, shuffle=hdf5plugin.Blosc.BITSHUFFLE
+            )
+        )
+    else:
+        raise ValueError(f"Unknown compression: {compression}")
+
+
 def create_extract_h5(
     h5_file,
     acquisition_metadata,
@@ -359,115 +658,107 @@ def create_extract_h5(
 
     h5_file.create_dataset("metadata/uuid", data=status_dict["uuid"])
 
+    compression = get_compression(config_data.get("frame_compression", "gzip"))
+
     # Creating scalar dataset
     for scalar in list(scalars_attrs.keys()):
-        h5_file.create_dataset(
-            f"scalars/{scalar}", (nframes,), "float32", compression="gzip"
+        ds = h5_file.create_dataset(
+            f"scalars/{scalar}", (nframes,), "float32", **compression
         )
-        h5_file[f"scalars/{scalar}"].attrs["description"] = scalars_attrs[scalar]
+        ds.attrs["description"] = scalars_attrs[scalar]
 
     # Timestamps
     if config_data.get("timestamps") is not None:
-        h5_file.create_dataset(
+        ds = h5_file.create_dataset(
             "timestamps",
             compression="gzip",
             data=config_data["timestamps"][first_frame_idx:last_frame_idx],
         )
-        h5_file["timestamps"].attrs["description"] = "Depth video timestamps"
+        ds.attrs["description"] = "Depth video timestamps"
 
     # Cropped Frames
-    h5_file.create_dataset(
+    frame_shape = (config_data["crop_size"][0], config_data["crop_size"][1])
+    ds = h5_file.create_dataset(
         "frames",
-        (nframes, config_data["crop_size"][0], config_data["crop_size"][1]),
+        (nframes,) + frame_shape,
         config_data["frame_dtype"],
-        compression="gzip",
+        **compression,
+        chunks=get_frame_chunks(nframes, frame_shape, config_data["frame_dtype"]),
     )
-    h5_file["frames"].attrs["description"] = (
+    ds.attrs["description"] = (
         "3D Numpy array of depth frames (nframes x w x h)." + " Depth values are in mm."
     )
     # Frame Masks for EM Tracking
     if config_data["use_tracking_model"]:
-        h5_file.create_dataset(
+        ds = h5_file.create_dataset(
             "frames_mask",
-            (nframes, config_data["crop_size"][0], config_data["crop_size"][1]),
+            (nframes,) + frame_shape,
             "float32",
-            compression="gzip",
+            **compression,
+            chunks=get_frame_chunks(nframes, frame_shape, "float32"),
         )
-        h5_file["frames_mask"].attrs[
+        ds.attrs[
             "description"
         ] = "Log-likelihood values from the tracking model (nframes x w x h)"
     else:
-        h5_file.create_dataset(
+        ds = h5_file.create_dataset(
             "frames_mask",
-            (nframes, config_data["crop_size"][0], config_data["crop_size"][1]),
+            (nframes,) + frame_shape,
             "bool",
-            compression="gzip",
+            **compression,
+            chunks=get_frame_chunks(nframes, frame_shape, "bool"),
         )
-        h5_file["frames_mask"].attrs[
-            "description"
-        ] = "Boolean mask, false=not mouse, true=mouse"
+        ds.attrs["description"] = "Boolean mask, false=not mouse, true=mouse"
 
     # Flip Classifier
     if config_data["flip_classifier"] is not None:
-        h5_file.create_dataset(
+        ds = h5_file.create_dataset(
             "metadata/extraction/flips", (nframes,), "bool", compression="gzip"
         )
-        h5_file["metadata/extraction/flips"].attrs[
+        ds.attrs[
             "description"
         ] = "Output from flip classifier, false=no flip, true=flip"
 
     # True Depth
-    h5_file.create_dataset(
+    ds = h5_file.create_dataset(
         "metadata/extraction/true_depth", data=config_data["true_depth"]
     )
-    h5_file["metadata/extraction/true_depth"].attrs[
-        "description"
-    ] = "Detected true depth of arena floor in mm"
+    ds.attrs["description"] = "Detected true depth of arena floor in mm"
 
     # ROI
-    h5_file.create_dataset("metadata/extraction/roi", data=roi, compression="gzip")
-    h5_file["metadata/extraction/roi"].attrs["description"] = "ROI mask"
+    ds = h5_file.create_dataset("metadata/extraction/roi", data=roi, compression="gzip")
+    ds.attrs["description"] = "ROI mask"
 
     # First Frame
-    h5_file.create_dataset(
+    ds = h5_file.create_dataset(
         "metadata/extraction/first_frame", data=first_frame[0], compression="gzip"
     )
-    h5_file["metadata/extraction/first_frame"].attrs[
-        "description"
-    ] = "First frame of depth dataset"
+    ds.attrs["description"] = "First frame of depth dataset"
 
     # First Frame index
-    h5_file.create_dataset(
+    ds = h5_file.create_dataset(
         "metadata/extraction/first_frame_idx",
         data=[first_frame_idx],
         compression="gzip",
     )
-    h5_file["metadata/extraction/first_frame_idx"].attrs[
-        "description"
-    ] = "First frame index of this dataset"
+    ds.attrs["description"] = "First frame index of this dataset"
 
     # Last Frame index
-    h5_file.create_dataset(
+    ds = h5_file.create_dataset(
         "metadata/extraction/last_frame_idx", data=[last_frame_idx], compression="gzip"
     )
-    h5_file["metadata/extraction/last_frame_idx"].attrs[
-        "description"
-    ] = "Last frame index of this dataset"
+    ds.attrs["description"] = "Last frame index of this dataset"
 
     # Background
-    h5_file.create_dataset(
+    ds = h5_file.create_dataset(
         "metadata/extraction/background", data=bground_im, compression="gzip"
     )
-    h5_file["metadata/extraction/background"].attrs[
-        "description"
-    ] = "Computed background image"
+    ds.attrs["description"] = "Computed background image"
 
     # Extract Version
-    extract_version = np.string_(get_distribution("moseq2-extract").version)
-    h5_file.create_dataset("metadata/extraction/extract_version", data=extract_version)
-    h5_file["metadata/extraction/extract_version"].attrs[
-        "description"
-    ] = "Version of moseq2-extract"
+    extract_version = np.string_(get_extract_version())
+    ds = h5_file.create_dataset("metadata/extraction/extract_version", data=extract_version)
+    ds.attrs["description"] = "Version of moseq2-extract"
 
     # Extraction Parameters
     from moseq2_extract.cli import extract
@@ -480,11 +771,12 @@ def create_extract_h5(
     )
 
     # Acquisition Metadata
+    acquisition = h5_file.require_group("metadata/acquisition")
     for key, value in acquisition_metadata.items():
         if type(value) is list and len(value) > 0 and type(value[0]) is str:
             value = [n.encode("utf8") for n in value]
 
         if value is not None:
-            h5_file.create_dataset(f"metadata/acquisition/{key}", data=value)
+            acquisition.create_dataset(key, data=value)
         else:
-            h5_file.create_dataset(f"metadata/acquisition/{key}", dtype="f")
+            acquisition.create_dataset(key, dtype="f")
@@ -7,10 +7,11 @@ import ruamel.yaml as yaml
 from os.path import exists, basename, dirname, join, abspath
 from os import makedirs, system
 from tqdm.auto import tqdm
+from concurrent.futures import ThreadPoolExecutor
 from moseq2_extract.extract.extract import extract_chunk
 from moseq2_extract.util import read_yaml
 from moseq2_extract.io.video import load_movie_data, write_frames_preview
-from moseq2_extract.helpers.data import check_completion_status
+from moseq2_extract.helpers.data import check_completion_status, write_frame_chunks
 
 
 def write_extracted_chunk_to_h5(
@@ -31,17 +32,29 @@ def write_extracted_chunk_to_h5(
     Returns:
     """
 
+    # contiguous batches are written as slices, whole frame chunks directly
+    if isinstance(frame_range, range) and frame_range.step == 1 and len(frame_range) > 0:
+        start = frame_range.start
+        frame_slice = slice(start, frame_range.stop)
+    else:
+        start = None
+        frame_slice = frame_range
+
     # Writing computed scalars to h5 file
     for scalar in scalars:
-        h5_file[f"scalars/{scalar}"][frame_range] = results["scalars"][scalar][offset:]
+        h5_file[f"scalars/{scalar}"][frame_slice] = results["scalars"][scalar][offset:]
 
     # Writing frames and mask to h5
-    h5_file["frames"][frame_range] = results["depth_frames"][offset:]
-    h5_file["frames_mask"][frame_range] = results["mask_frames"][offset:]
+    if start is not None:
+        write_frame_chunks(h5_file["frames"], results["depth_frames"][offset:], start)
+        write_frame_chunks(h5_file["frames_mask"], results["mask_frames"][offset:], start)
+    else:
+        h5_file["frames"][frame_slice] = results["depth_frames"][offset:]
+        h5_file["frames_mask"][frame_slice] = results["mask_frames"][offset:]
 
     # Writing flip classifier results to h5
     if config_data["flip_classifier"]:
-        h5_file["metadata/extraction/flips"][frame_range] = results["flips"][offset:]
+        h5_file["metadata/extraction/flips"][frame_slice] = results["flips"][offset:]
 
 
 def set_tracking_model_parameters(
@@ -147,54 +160,64 @@ def process_extract_batches(
     tracking_init_mean = config_data.pop("tracking_init_mean", None)
     tracking_init_cov = config_data.pop("tracking_init_cov", None)
 
-    for i, frame_range in enumerate(tqdm(frame_batches, desc="Processing batches")):
-        raw_chunk = load_movie_data(
+    def load_batch(frame_range):
+        return load_movie_data(
             input_file, frame_range, frame_size=bground_im.shape[::-1], **config_data
         )
 
-        offset = config_data["chunk_overlap"] if i > 0 else 0
-
-        # Get crop-rotated frame batch
-        results = extract_chunk(
-            **config_data,
-            **str_els,
-            chunk=raw_chunk,
-            roi=roi,
-            bground=bground_im,
-            tracking_init_mean=tracking_init_mean,
-            tracking_init_cov=tracking_init_cov,
-        )
-
-        if config_data["use_tracking_model"]:
-            # threshold and clip mask frames from EM tracking results
-            results, tracking_init_mean, tracking_init_cov = (
-                set_tracking_model_parameters(results, **config_data)
+    # read the next batch from disk in a background thread while the current one is extracted
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        if len(frame_batches) > 0:
+            next_chunk = reader.submit(load_batch, frame_batches[0])
+
+        for i, frame_range in enumerate(tqdm(frame_batches, desc="Processing batches")):
+            raw_chunk = next_chunk.result()
+            if i + 1 < len(frame_batches):
+                next_chunk = reader.submit(load_batch, frame_batches[i + 1])
+
+            offset = config_data["chunk_overlap"] if i > 0 else 0
+
+            # Get crop-rotated frame batch
+            results = extract_chunk(
+                **config_data,
+                **str_els,
+                chunk=raw_chunk,
+                roi=roi,
+                bground=bground_im,
+                tracking_init_mean=tracking_init_mean,
+                tracking_init_cov=tracking_init_cov,
             )
 
-        # Offsetting frame chunk by CLI parameter defined option: chunk_overlap
-        frame_range = frame_range[offset:]
-
-        if h5_file is not None:
-            write_extracted_chunk_to_h5(
-                h5_file, results, config_data, scalars, frame_range, offset
+            if config_data["use_tracking_model"]:
+                # threshold and clip mask frames from EM tracking results
+                results, tracking_init_mean, tracking_init_cov = (
+                    set_tracking_model_parameters(results, **config_data)
+                )
+
+            # Offsetting frame chunk by CLI parameter defined option: chunk_overlap
+            frame_range = frame_range[offset:]
+
+            if h5_file is not None:
+                write_extracted_chunk_to_h5(
+                    h5_file, results, config_data, scalars, frame_range, offset
+                )
+
+            # Create array for output movie with filtered video and cropped mouse on the top left
+            output_movie = make_output_movie(results, config_data, offset)
+
+            # Writing frame batch to mp4 file
+            video_pipe = write_frames_preview(
+                output_mov_path,
+                output_movie,
+                pipe=video_pipe,
+                close_pipe=False,
+                fps=config_data["fps"],
+                frame_range=list(frame_range),
+                depth_max=config_data["max_height"],
+                depth_min=config_data["min_height"],
+                progress_bar=config_data.get("progress_bar", False),
             )
 
-        # Create array for output movie with filtered video and cropped mouse on the top left
-        output_movie = make_output_movie(results, config_data, offset)
-
-        # Writing frame batch to mp4 file
-        video_pipe = write_frames_preview(
-            output_mov_path,
-            output_movie,
-            pipe=video_pipe,
-            close_pipe=False,
-            fps=config_data["fps"],
-            frame_range=list(frame_range),
-            depth_max=config_data["max_height"],
-            depth_min=config_data["min_height"],
-            progress_bar=config_data.get("progress_bar", False),
-        )
-
     # Check if video is done writing. If not, wait.
     if video_pipe is not None:
         video_pipe.communicate()
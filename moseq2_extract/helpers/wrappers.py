@@ -23,6 +23,7 @@ from moseq2_extract.io.video import load_movie_data, get_movie_info, write_frame
 from moseq2_extract.util import mouse_threshold_filter, filter_warnings, read_yaml
 from moseq2_extract.helpers.data import (
     handle_extract_metadata,
+    create_h5_file,
     create_extract_h5,
     build_index_dict,
     load_extraction_meta_from_h5s,
@@ -127,7 +128,7 @@ def generate_index_wrapper(input_dir, output_file):
 
 
 def aggregate_extract_results_wrapper(
-    input_dir, format, output_dir, mouse_threshold=0.0
+    input_dir, format, output_dir, mouse_threshold=0.0, hardlink=False
 ):
     """
     Aggregate results to one folder and generate index file (moseq2-index.yaml).
@@ -137,6 +138,7 @@ def aggregate_extract_results_wrapper(
     format (str): string format for metadata to use as the new aggregated filename
     output_dir (str): name of the directory to create and store all results in
     mouse_threshold (float): threshold value of mean frame depth to include session frames
+    hardlink (bool): hard link unmodified h5 and mp4 files into output_dir instead of copying them
 
     Returns:
     indexpath (str): path to generated index file including all aggregated session information.
@@ -168,7 +170,7 @@ def aggregate_extract_results_wrapper(
 
     manifest = build_manifest(loaded, format=format)
 
-    copy_manifest_results(manifest, output_dir)
+    copy_manifest_results(manifest, output_dir, hardlink=hardlink)
 
     print("Results successfully aggregated in", output_dir)
 
@@ -474,7 +476,7 @@ def extract_wrapper(input_file, output_dir, config_data, num_frames=None, skip=F
     }
 
     # farm out the batches and write to an hdf5 file
-    with h5py.File(results_filename, "w") as f:
+    with create_h5_file(results_filename) as f:
         # Write scalars, roi, acquisition metadata, etc. to h5 file
         create_extract_h5(
             **extraction_data,
@@ -251,7 +251,7 @@ def write_frames(
     for i in tqdm(
         range(frames.shape[0]), disable=True, desc=f"Writing frames to {filename}"
     ):
-        pipe.stdin.write(frames[i].astype(frame_dtype).tostring())
+        pipe.stdin.write(frames[i].astype(frame_dtype, copy=False).tostring())
 
     if close_pipe:
         pipe.communicate()
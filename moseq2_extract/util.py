@@ -13,6 +13,7 @@ import warnings
 import numpy as np
 from glob import glob
 from copy import deepcopy
+from functools import lru_cache
 import ruamel.yaml as yaml
 from typing import Pattern
 from cytoolz import valmap
@@ -426,9 +427,29 @@ def get_strels(config_data):
 
     return str_els
 
+@lru_cache(maxsize=32)
+def _get_structuring_element(shape, size):
+    """
+    Build a structuring element, cached so each unique element is only drawn once.
+
+    Args:
+    shape (int): cv2.MORPH_ELLIPSE or cv2.MORPH_RECT
+    size (tuple): size of structuring element
+
+    Returns:
+    strel (cv2.StructuringElement): read-only structuring element, shared between callers.
+    """
+
+    strel = cv2.getStructuringElement(shape, size)
+    strel.setflags(write=False)
+
+    return strel
+
+
 def select_strel(string='e', size=(10, 10)):
     """
     Returns structuring element of specified shape.
+    Elements are cached and shared, so the returned array is read-only.
 
     Args:
     string (str): string to indicate whether to use ellipse or rectangle
@@ -438,14 +459,10 @@ def select_strel(string='e', size=(10, 10)):
     strel (cv2.StructuringElement): selected cv2 StructuringElement to use in video filtering or ROI dilation/erosion.
     """
 
-    if string[0].lower() == 'e':
-        strel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, size)
-    elif string[0].lower() == 'r':
-        strel = cv2.getStructuringElement(cv2.MORPH_RECT, size)
-    else:
-        strel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, size)
+    if string[0].lower() == 'r':
+        return _get_structuring_element(cv2.MORPH_RECT, tuple(size))
 
-    return strel
+    return _get_structuring_element(cv2.MORPH_ELLIPSE, tuple(size))
 
 def convert_pxs_to_mm(coords, resolution=(512, 424), field_of_view=(70.6, 60), true_depth=673.1):
     """
@@ -708,7 +725,7 @@ def load_textdata(data_file, dtype=np.float32):
             data.append(clean_data)
 
     data = np.stack(data, axis=0).squeeze()
-    timestamps = np.array(timestamps, dtype=np.int)
+    timestamps = np.array(timestamps, dtype=np.int64)
 
     return data, timestamps
 
@@ -750,12 +767,15 @@ def build_path(keys: dict, format_string: str, snake_case=True) -> str:
 
     return clean_file_str(format_string.format(**keys))
 
-def read_yaml(yaml_file):
+@lru_cache(maxsize=32)
+def _load_yaml(yaml_file, mtime, size):
     """
-    Read yaml file into a dictionary
+    Parse a yaml file, cached on its path, modification time and size.
 
     Args:
-    yaml_file (str): path to yaml file
+    yaml_file (str): absolute path to yaml file
+    mtime (int): modification time of the file in nanoseconds
+    size (int): size of the file in bytes
 
     Returns:
     return_dict (dict): dict of yaml contents
@@ -764,6 +784,33 @@ def read_yaml(yaml_file):
     with open(yaml_file, 'r') as f:
         return yaml.safe_load(f)
 
+
+def read_yaml(yaml_file):
+    """
+    Read yaml file into a dictionary. Files are parsed once and reparsed only after they are modified.
+
+    Args:
+    yaml_file (str): path to yaml file
+
+    Returns:
+    return_dict (dict): dict of yaml contents
+    """
+
+    stat = os.stat(yaml_file)
+    # callers are free to modify the returned dict, so never hand out the cached one
+    return deepcopy(_load_yaml(abspath(yaml_file), stat.st_mtime_ns, stat.st_size))
+
+
+def clear_yaml_cache():
+    """
+    Discard all yaml files cached by read_yaml().
+
+    Returns:
+    None
+    """
+
+    _load_yaml.cache_clear()
+
 def mouse_threshold_filter(h5file, thresh=0):
     """
     Filter frames in h5 files by threshold value.
@@ -796,12 +843,32 @@ def _load_h5_to_dict(file: h5py.File, path) -> dict:
     ans = {}
     for key, item in file[path].items():
         if isinstance(item, h5py._hl.dataset.Dataset):
-            ans[key] = item[()]
+            ans[key] = _read_dataset(item)
         elif isinstance(item, h5py._hl.group.Group):
             ans[key] = _load_h5_to_dict(file, '/'.join([path, key]))
     return ans
 
 
+def _read_dataset(dataset):
+    """
+    Read a whole dataset. Numeric arrays are read straight into a preallocated buffer through the
+    low-level dataset id, skipping the selection handling of Dataset.__getitem__; scalars, strings
+    and other types go through dataset[()].
+
+    Args:
+    dataset (h5py.Dataset): dataset to read.
+
+    Returns:
+    data (np.ndarray or scalar): contents of the dataset.
+    """
+
+    if dataset.shape and dataset.dtype.kind in 'biuf':
+        data = np.empty(dataset.shape, dtype=dataset.dtype)
+        dataset.id.read(h5py.h5s.ALL, h5py.h5s.ALL, data)
+        return data
+    return dataset[()]
+
+
 def h5_to_dict(h5file, path) -> dict:
     """
     Load h5 contents to dictionary object.
@@ -850,9 +917,10 @@ def clean_dict(dct):
 _underscorer1: Pattern[str] = re.compile(r'(.)([A-Z][a-z]+)')
 _underscorer2 = re.compile('([a-z0-9])([A-Z])')
 
+@lru_cache(maxsize=1024)
 def camel_to_snake(s):
     """
-    Convert CamelCase to snake_case
+    Convert CamelCase to snake_case, memoized since the same metadata keys are converted for every session.
 
     Args:
     s (str): CamelCase string to convert to snake_case.
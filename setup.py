@@ -52,5 +52,6 @@ setup(
             "sphinx-click",
             "sphinx-rtd-theme",
         ],
+        "blosc": ["hdf5plugin"],
     },
 )
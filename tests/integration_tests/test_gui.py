@@ -63,6 +63,28 @@ class GUITests(TestCase):
         test_ret = get_selected_sessions(to_extract, extract_all)
         assert test_ret == [to_extract[0]]
 
+        with open(stdin, "w") as f:
+            f.write("1-3, e2")
+
+        sys.stdin = open(stdin)
+        test_ret = get_selected_sessions(to_extract, extract_all)
+        assert test_ret == [to_extract[0], to_extract[2]]
+
+        # a malformed selection re-prompts instead of selecting every session
+        with open(stdin, "w") as f:
+            f.write("1 3\n2")
+
+        sys.stdin = open(stdin)
+        test_ret = get_selected_sessions(to_extract, extract_all)
+        assert test_ret == [to_extract[1]]
+
+        with open(stdin, "w") as f:
+            f.write("1, 3x\nq")
+
+        sys.stdin = open(stdin)
+        test_ret = get_selected_sessions(to_extract, extract_all)
+        assert test_ret == []
+
     def test_generate_config_command(self):
 
         config_path = "data/test_config.yaml"
@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+import numpy.testing as npt
+from unittest import TestCase
+from moseq2_extract.extract.extract import map_frame_chunks, extract_chunk
+from moseq2_extract.extract.proc import get_frame_features, crop_and_rotate_frames
+
+
+class TestExtract(TestCase):
+
+    def test_map_frame_chunks(self):
+
+        fake_mouse = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (30, 20))
+
+        tmp_image = np.zeros((80, 80), dtype="uint8")
+        center = np.array(tmp_image.shape) // 2
+
+        mouse_dims = np.array(fake_mouse.shape) // 2
+
+        tmp_image[
+            center[0] - mouse_dims[0] : center[0] + mouse_dims[0],
+            center[1] - mouse_dims[1] : center[1] + mouse_dims[1],
+        ] = fake_mouse * 30
+
+        fake_movie = np.tile(tmp_image, (25, 1, 1))
+
+        features, mask = get_frame_features(fake_movie, frame_threshold=10)
+        par_features, par_mask = map_frame_chunks(
+            get_frame_features, fake_movie, num_workers=2, frame_threshold=10
+        )
+
+        npt.assert_array_equal(mask, par_mask)
+        for k in features:
+            npt.assert_array_equal(features[k], par_features[k])
+
+        cropped = crop_and_rotate_frames(fake_movie, features)
+        par_cropped = map_frame_chunks(
+            crop_and_rotate_frames, fake_movie, features, num_workers=2
+        )
+
+        npt.assert_array_equal(cropped, par_cropped)
+
+    def test_map_frame_chunks_strel_sized_chunk(self):
+
+        # a chunk with as many frames as the strel has rows must not split the strel across workers
+        bground = np.full((80, 80), 670.0)
+        chunk = np.tile(bground, (9, 1, 1))
+        for i in range(9):
+            mouse = np.zeros((80, 80), dtype="float32")
+            cv2.ellipse(mouse, (30 + i, 40), (15, 8), 10 * i, 0, 360, 40, -1)
+            chunk[i] -= mouse
+        chunk = chunk.astype("int16")
+
+        strel_tail = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (9, 9))
+        strel_min = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+        kwargs = dict(
+            bground=bground,
+            strel_tail=strel_tail,
+            strel_min=strel_min,
+            iters_min=1,
+            crop_size=(40, 40),
+        )
+
+        results = extract_chunk(chunk.copy(), **kwargs)
+        par_results = extract_chunk(chunk.copy(), num_workers=2, **kwargs)
+
+        npt.assert_array_equal(results["depth_frames"], par_results["depth_frames"])
+        npt.assert_array_equal(results["mask_frames"], par_results["mask_frames"])
+        for k in results["scalars"]:
+            npt.assert_array_equal(results["scalars"][k], par_results["scalars"][k])
@@ -15,6 +15,13 @@ from moseq2_extract.extract.proc import (
     clean_frames,
     get_largest_cc,
     feature_hampel_filter,
+    get_strel_rectangles,
+    morph_rectangles,
+    subtract_background,
+    threshold_chunk,
+    apply_roi,
+    apply_flips,
+    get_bbox,
 )
 
 
@@ -112,6 +119,18 @@ class TestExtractProc(TestCase):
 
         assert percent_pixels_diff < 0.1
 
+        # cropping several arrays at once matches cropping each of them separately
+        fake_mask = (fake_movie > 0.4).astype("float32")
+        fake_ints = (fake_movie * 100).astype("uint8")
+        for arrays in [(fake_movie, fake_mask), (fake_movie, fake_mask, fake_ints)]:
+            cropped = crop_and_rotate_frames(arrays, features=features)
+            assert isinstance(cropped, tuple) and len(cropped) == len(arrays)
+            for frames, cropped_frames in zip(arrays, cropped):
+                assert cropped_frames.dtype == frames.dtype
+                npt.assert_array_equal(
+                    crop_and_rotate_frames(frames, features=features), cropped_frames
+                )
+
     def test_get_frame_features(self):
 
         fake_mouse = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (30, 20))
@@ -207,6 +226,97 @@ class TestExtractProc(TestCase):
         fake_movie = np.tile(fake_mouse, (100, 1, 1))
         cleaned_fake_movie = clean_frames(fake_movie, prefilter_time=(3,))
 
+    def test_get_strel_rectangles(self):
+
+        fake_frame = np.random.randint(0, 50, size=(120, 100), dtype="uint8")
+        fake_frame[20:60, 30:70] = 200
+
+        for size in [(9, 9), (15, 15), (7, 11)]:
+            strel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, size)
+            rectangles = get_strel_rectangles(strel)
+            assert rectangles is not None
+
+            npt.assert_array_equal(
+                morph_rectangles(fake_frame, rectangles, cv2.erode),
+                cv2.erode(fake_frame, strel),
+            )
+            npt.assert_array_equal(
+                morph_rectangles(fake_frame, rectangles, cv2.dilate),
+                cv2.dilate(fake_frame, strel),
+            )
+
+            # filtering in place matches filtering into a new array
+            in_place = fake_frame.copy()
+            morph_rectangles(in_place, rectangles, cv2.erode, dst=in_place)
+            npt.assert_array_equal(in_place, cv2.erode(fake_frame, strel))
+
+        assert get_strel_rectangles(cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))) is None
+        assert get_strel_rectangles(cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))) is None
+
+    def test_subtract_background(self):
+
+        bground = np.full((60, 80), 670, dtype="float64")
+        bground += np.random.randn(*bground.shape)
+        roi = np.zeros(bground.shape, dtype="uint8")
+        cv2.circle(roi, (40, 30), 20, 1, -1)
+
+        chunk = np.tile(bground, (10, 1, 1)).astype("int16")
+        chunk[:, 25:35, 35:45] -= np.random.randint(0, 150, size=(10, 10, 10), dtype="int16")
+        chunk[:, 28:30, 38:40] = 0
+
+        expected = ((bground - chunk) * (chunk != 0)).astype("uint8")
+        expected = threshold_chunk(expected, 10, 100).astype("uint8")
+        expected = apply_roi(expected, roi)
+
+        subtracted = subtract_background(chunk, bground, 10, 100, roi=roi)
+        assert subtracted.dtype == np.uint8
+        npt.assert_array_equal(subtracted, expected)
+
+        # heights too large for uint8 saturate and are thresholded out instead of wrapping into range
+        chunk[:, 30, 40] = bground[30, 40] - 300
+        subtracted = subtract_background(chunk, bground, 10, 100, roi=roi)
+        assert np.all(subtracted[:, 30 - 10, 40 - 20] == 0)
+
+    def test_subtract_background_float_roi(self):
+
+        # rois that are not boolean (e.g. with bg_roi_fill_holes off) multiply the frames
+        bground = np.full((60, 80), 670, dtype="float64")
+        bground += np.random.randn(*bground.shape)
+        roi = np.zeros(bground.shape, dtype="float64")
+        cv2.circle(roi, (40, 30), 20, 1, -1)
+        roi[30:35, 40:45] = 0.5
+
+        chunk = np.tile(bground, (10, 1, 1)).astype("int16")
+        chunk[:, 25:35, 35:45] -= np.random.randint(0, 90, size=(10, 10, 10), dtype="int16")
+
+        bbox = get_bbox(roi)
+        crop = (slice(None), slice(bbox[0, 0], bbox[1, 0]), slice(bbox[0, 1], bbox[1, 1]))
+
+        npt.assert_array_equal(apply_roi(chunk, roi), (chunk * roi)[crop])
+
+        expected = ((bground - chunk) * (chunk != 0)).astype("uint8")
+        expected = threshold_chunk(expected, 10, 100).astype("uint8")
+        expected = (expected * roi)[crop]
+
+        subtracted = subtract_background(chunk, bground, 10, 100, roi=roi)
+        assert subtracted.dtype == expected.dtype
+        npt.assert_array_equal(subtracted, expected)
+
+    def test_apply_flips(self):
+
+        frames = np.random.randint(0, 255, size=(20, 8, 10), dtype="uint8")
+        mask = np.random.rand(20, 8, 10)
+        flips = np.zeros(20, dtype="bool")
+        flips[[0, 3, 4, 5, 12, 19]] = True
+
+        expected_frames, expected_mask = frames.copy(), mask.copy()
+        expected_frames[flips] = np.rot90(expected_frames[flips], k=2, axes=(1, 2))
+        expected_mask[flips] = np.rot90(expected_mask[flips], k=2, axes=(1, 2))
+
+        apply_flips(flips, frames, mask)
+        npt.assert_array_equal(frames, expected_frames)
+        npt.assert_array_equal(mask, expected_mask)
+
     def test_feature_hampel_filter(self):
 
         fake_mouse = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (30, 20))
@@ -70,3 +70,9 @@ class TestEMTracking(TestCase):
             # this is very loose atm, need to figure out what's going on here...
             for mu in parameters["mean"]:
                 npt.assert_allclose(mu[:2], center[::-1], atol=5, rtol=0)
+
+        # likelihoods computed during tracking match a separate em_get_ll pass
+        parameters, ll = em_tracking(
+            frames=fake_movie, raw_frames=fake_movie, return_ll=True
+        )
+        npt.assert_array_equal(ll, em_get_ll(fake_movie, **parameters))
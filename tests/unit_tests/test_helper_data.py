@@ -1,9 +1,13 @@
 import os
 import sys
+import h5py
 import shutil
+import subprocess
 import tarfile
+import numpy as np
+import numpy.testing as npt
 import ruamel.yaml as yaml
-from unittest import TestCase
+from unittest import TestCase, mock
 from moseq2_extract.util import load_metadata
 from ..integration_tests.test_cli import write_fake_movie
 from moseq2_extract.helpers.data import (
@@ -13,6 +17,11 @@ from moseq2_extract.helpers.data import (
     copy_manifest_results,
     handle_extract_metadata,
     build_index_dict,
+    create_h5_file,
+    get_frame_chunks,
+    get_compression,
+    fast_copy,
+    write_frame_chunks,
 )
 
 
@@ -25,6 +34,119 @@ class TestHelperData(TestCase):
         tmp_file = "data/test_file.yaml"  # non-existent
         assert check_completion_status(tmp_file) == False
 
+    def test_create_h5_file(self):
+        tmp_file = "data/tmp_create.h5"
+
+        with create_h5_file(tmp_file, metadata_cache_size=4 * 1024 ** 2) as f:
+            cache_config = f.id.get_access_plist().get_mdc_config()
+            assert cache_config.max_size == 4 * 1024 ** 2
+            f.create_dataset("scalars/x", data=[1, 2, 3])
+
+        with h5py.File(tmp_file, "r") as f:
+            assert list(f["scalars/x"][()]) == [1, 2, 3]
+
+        os.remove(tmp_file)
+
+    def test_get_frame_chunks(self):
+        assert get_frame_chunks(1000, (80, 80), "uint8") == (163, 80, 80)
+        assert get_frame_chunks(1000, (80, 80), "float32") == (40, 80, 80)
+        assert get_frame_chunks(10, (80, 80), "uint8") == (10, 80, 80)
+
+    def test_handle_extract_metadata_relative_path(self):
+        session_dir = "data/relative_session"
+        os.makedirs(session_dir, exist_ok=True)
+        with open(os.path.join(session_dir, "metadata.json"), "w") as f:
+            f.write('{"SessionName": "test", "SubjectName": "mouse"}')
+        with open(os.path.join(session_dir, "timestamps.csv"), "w") as f:
+            f.write("1\n2\n3\n")
+
+        cwd = os.getcwd()
+        os.chdir(session_dir)
+        try:
+            # a bare filename has an empty dirname, which should resolve to the cwd
+            acq_metadata, timestamps, tar = handle_extract_metadata(
+                "depth.dat", os.path.dirname("depth.dat")
+            )
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(session_dir)
+
+        assert acq_metadata["SessionName"] == "test"
+        npt.assert_array_equal(timestamps, [1000, 2000, 3000])
+        assert tar is None
+
+    def test_fast_copy(self):
+        src = "data/fast_copy_src.bin"
+        dst = "data/fast_copy_dst.bin"
+        payload = os.urandom(3 * 1024 ** 2 + 17)
+        with open(src, "wb") as f:
+            f.write(payload)
+
+        fast_copy(src, dst)
+        with open(dst, "rb") as f:
+            assert f.read() == payload
+
+        # the kernel copy (copy_file_range or sendfile on python 3.7) must not fall back
+        if hasattr(os, "copy_file_range") or hasattr(os, "sendfile"):
+            with mock.patch(
+                "moseq2_extract.helpers.data.shutil.copyfile", side_effect=AssertionError
+            ):
+                fast_copy(src, dst)
+            with open(dst, "rb") as f:
+                assert f.read() == payload
+
+        os.remove(src)
+        os.remove(dst)
+
+    def test_write_frame_chunks(self):
+        test_file = "data/test_write_frame_chunks.h5"
+        frames = np.random.randint(0, 30, size=(500, 20, 20)).astype("uint8")
+
+        with h5py.File(test_file, "w") as f:
+            f.create_dataset(
+                "frames", frames.shape, "uint8", compression="gzip", chunks=(64, 20, 20)
+            )
+            for start in range(0, 500, 150):
+                write_frame_chunks(f["frames"], frames[start : start + 150], start)
+
+        with h5py.File(test_file, "r") as f:
+            npt.assert_array_equal(f["frames"][()], frames)
+
+        os.remove(test_file)
+
+    def test_lz4_compression_round_trip(self):
+        try:
+            import hdf5plugin  # noqa: F401
+        except ImportError:
+            self.skipTest("hdf5plugin is not installed")
+
+        test_file = "data/test_lz4_compression.h5"
+        frames = np.random.randint(0, 30, size=(20, 40, 40)).astype("uint8")
+        with h5py.File(test_file, "w") as f:
+            f.create_dataset("frames", data=frames, **get_compression("lz4"))
+            f.create_dataset("metadata/acquisition/mean", data=frames.mean(axis=(1, 2)))
+
+        # read back in a fresh interpreter through the package's readers only
+        script = (
+            "import sys, numpy as np\n"
+            "from moseq2_extract.util import mouse_threshold_filter, h5_to_dict\n"
+            f"assert mouse_threshold_filter({test_file!r}, thresh=0)\n"
+            f"meta = h5_to_dict({test_file!r}, 'metadata/acquisition')\n"
+            "print(float(meta['mean'].sum()))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script], stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        os.remove(test_file)
+
+        assert result.returncode == 0, result.stderr.decode()
+        npt.assert_allclose(float(result.stdout), frames.mean(axis=(1, 2)).sum())
+
+    def test_get_compression(self):
+        assert get_compression("gzip") == {"compression": "gzip"}
+        with self.assertRaises(ValueError):
+            get_compression("bz2")
+
     def test_build_index_dict(self):
 
         test_file = "data/proc/results_00.yaml"
@@ -95,6 +217,37 @@ class TestHelperData(TestCase):
 
         shutil.rmtree(output_dir)
 
+    def test_copy_manifest_results_duplicate_paths(self):
+        input_dir = "data/dup_sessions/"
+        output_dir = "data/dup_output/"
+        os.makedirs(input_dir, exist_ok=True)
+
+        manifest = {}
+        for i in range(4):
+            h5_path = os.path.join(input_dir, f"results_{i}.h5")
+            with h5py.File(h5_path, "w") as f:
+                f.create_dataset("index", data=[i])
+            manifest[h5_path] = {
+                "copy_path": "session" if i < 3 else "other_session",
+                "yaml_dict": {"index": i},
+                "additional_metadata": {},
+            }
+
+        copy_manifest_results(manifest, output_dir)
+
+        # the first manifest entry wins a shared copy_path
+        with h5py.File(os.path.join(output_dir, "session.h5"), "r") as f:
+            assert f["index"][0] == 0
+        assert sorted(os.listdir(output_dir)) == [
+            "other_session.h5",
+            "other_session.yaml",
+            "session.h5",
+            "session.yaml",
+        ]
+
+        shutil.rmtree(input_dir)
+        shutil.rmtree(output_dir)
+
     def test_handle_extract_metadata(self):
         dirname = "data/"
         tmp_file = "data/test_vid.tar.gz"
@@ -107,6 +107,20 @@ class TestExtractUtils(TestCase):
 
         assert truth_dict == test_dict
 
+        # cached contents are not shared between callers
+        test_dict["cluster_type"] = "changed"
+        assert read_yaml(test_file) == truth_dict
+
+        # modified files are read again
+        tmp_file = "data/tmp_read_yaml.yaml"
+        with open(tmp_file, "w") as f:
+            yaml.safe_dump({"a": 1}, f)
+        assert read_yaml(tmp_file) == {"a": 1}
+        with open(tmp_file, "w") as f:
+            yaml.safe_dump({"a": 2, "b": 3}, f)
+        assert read_yaml(tmp_file) == {"a": 2, "b": 3}
+        os.remove(tmp_file)
+
     def test_clean_file_str(self):
         test_name = 'd<a:t\\t"a'
         truth_out = "d-a-t-t-a"